@@ -1,17 +1,27 @@
 import re
 from dataclasses import dataclass
-from typing import Optional
+from typing import Optional, Union, List
 import hashlib
 
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
 
-@dataclass
+try:
+    import re2
+except ImportError:
+    re2 = None
+
+
+@dataclass(frozen=True, slots=True)
 class BlockDetectionResult:
     is_blocked: bool
     reason: Optional[str] = None
     confidence: float = 0.0  # 0.0 to 1.0
 
 
-HIGH_CONFIDENCE_KEYWORDS = [
+HIGH_CONFIDENCE_KEYWORDS = tuple(kw.lower() for kw in (
     "access denied",
     "403 forbidden",
     "401 unauthorized",
@@ -22,9 +32,9 @@ HIGH_CONFIDENCE_KEYWORDS = [
     "sorry, you have been blocked",
     "request blocked",
     "access denied - akamai",
-]
+))
 
-MEDIUM_CONFIDENCE_KEYWORDS = [
+MEDIUM_CONFIDENCE_KEYWORDS = tuple(kw.lower() for kw in (
     "verify you are human",
     "human verification",
     "checking your browser",
@@ -32,15 +42,15 @@ MEDIUM_CONFIDENCE_KEYWORDS = [
     "enable javascript and cookies",
     "too many requests",
     "rate limit exceeded",
-]
+))
 
-LOW_CONFIDENCE_KEYWORDS = [
+LOW_CONFIDENCE_KEYWORDS = tuple(kw.lower() for kw in (
     "captcha",
     "recaptcha",
     "hcaptcha",
     "cloudflare",
     "security check",
-]
+))
 
 BLOCKED_STATUS_CODES = {
     401: "Unauthorized",
@@ -50,44 +60,119 @@ BLOCKED_STATUS_CODES = {
     503: "Service Unavailable (possibly blocked)",
 }
 
+# Below this a matching length says nothing; block pages are often this small
+MIN_REFERENCE_LENGTH = 10000
+
+_TITLE_RE = re.compile(rb'<title[^>]*>(.*?)</title>', re.IGNORECASE | re.DOTALL)
+_HTML_RE = re.compile(r'<html', re.IGNORECASE)
+_BODY_RE = re.compile(r'<body', re.IGNORECASE)
+
+# Keywords paired with their bytes form, matched against the lowered raw body
+_HIGH_KEYWORD_BYTES = tuple((kw, kw.encode()) for kw in HIGH_CONFIDENCE_KEYWORDS)
+_MEDIUM_KEYWORD_BYTES = tuple((kw, kw.encode()) for kw in MEDIUM_CONFIDENCE_KEYWORDS)
+_LOW_KEYWORD_BYTES = tuple(kw.encode() for kw in LOW_CONFIDENCE_KEYWORDS)
+_MIN_KEYWORD_LENGTH = min(
+    len(kw) for kw in HIGH_CONFIDENCE_KEYWORDS + MEDIUM_CONFIDENCE_KEYWORDS + LOW_CONFIDENCE_KEYWORDS
+)
+
+# With google-re2 installed, one DFA pass over the body tells whether any
+# keyword is present at all; the ordered per-tier loops only run if one is.
+_KEYWORD_FILTER_RE = re2.compile(b'|'.join(
+    re.escape(kw.encode())
+    for kw in HIGH_CONFIDENCE_KEYWORDS + MEDIUM_CONFIDENCE_KEYWORDS + LOW_CONFIDENCE_KEYWORDS
+)) if re2 is not None else None
+
+
+def _max_confidence(status_code: int, content_length: int) -> float:
+    # Upper bound on the score detect_block() can reach for this status and
+    # length: every check is assumed to fire, keywords at their best (title)
+    # weight, then the large-page penalty is applied. Anything above 20000
+    # bytes tops out at 0.4, so big pages never need a keyword scan.
+    bound = 0.5
+    if status_code in [403, 429]:
+        bound += 0.3
+    if content_length < 10000:
+        bound += 0.2
+    if content_length < 3000:
+        bound += 0.15
+    if content_length < 500 and status_code >= 400:
+        bound += 0.2
+    if content_length < 100 and status_code != 204:
+        bound += 0.3
 
-def detect_block(response_text: str, status_code: int, content_length: int,
-                 reference_hash: Optional[str] = None, reference_length: Optional[int] = None) -> BlockDetectionResult:
-    reasons = []
-    confidence = 0.0
+    if content_length > 50000:
+        bound *= 0.3
+    elif content_length > 20000:
+        bound *= 0.5
 
-    content_lower = response_text.lower()
+    return bound
 
-    title_match = re.search(r'<title[^>]*>(.*?)</title>', content_lower, re.IGNORECASE | re.DOTALL)
-    title_text = title_match.group(1) if title_match else ""
 
-    if status_code in [403, 429]:
-        reasons.append(f"HTTP {status_code}: {BLOCKED_STATUS_CODES.get(status_code, 'Error')}")
-        confidence += 0.3
+def _score_keywords(content: bytes, content_length: int, confidence: float, reasons: List[str]) -> float:
+    # bytes.lower() only folds ASCII, which is all the keywords need
+    content_lower = content.lower()
 
-    for keyword in HIGH_CONFIDENCE_KEYWORDS:
-        if keyword.lower() in title_text:
+    # Only run the title regex from the first '<title', if there is one
+    title_text = b""
+    title_pos = content_lower.find(b'<title')
+    if title_pos != -1:
+        title_match = _TITLE_RE.search(content_lower, title_pos)
+        if title_match:
+            title_text = title_match.group(1)
+
+    body_has_keyword = True
+    if _KEYWORD_FILTER_RE is not None and content_length < 10000:
+        body_has_keyword = _KEYWORD_FILTER_RE.search(content_lower) is not None
+
+    for keyword, keyword_bytes in _HIGH_KEYWORD_BYTES:
+        if keyword_bytes in title_text:
             confidence += 0.5
             reasons.append(f"Block indicator in title: {keyword}")
             break
-        elif keyword.lower() in content_lower and content_length < 5000:
+        elif content_length < 5000 and body_has_keyword and keyword_bytes in content_lower:
             confidence += 0.3
             reasons.append(f"Block indicator: {keyword}")
             break
 
-    if content_length < 10000:
-        for keyword in MEDIUM_CONFIDENCE_KEYWORDS:
-            if keyword.lower() in content_lower:
+    if content_length < 10000 and body_has_keyword:
+        for keyword, keyword_bytes in _MEDIUM_KEYWORD_BYTES:
+            if keyword_bytes in content_lower:
                 confidence += 0.2
                 reasons.append(f"Possible block: {keyword}")
                 break
 
-    if content_length < 3000:
-        low_count = sum(1 for kw in LOW_CONFIDENCE_KEYWORDS if kw.lower() in content_lower)
+    if content_length < 3000 and body_has_keyword:
+        low_count = sum(1 for kw in _LOW_KEYWORD_BYTES if kw in content_lower)
         if low_count >= 2:
             confidence += 0.15
             reasons.append("Multiple security indicators")
 
+    return confidence
+
+
+def detect_block(content: bytes, status_code: int, content_length: int,
+                 reference_hash: Optional[str] = None, reference_length: Optional[int] = None) -> BlockDetectionResult:
+    if _max_confidence(status_code, content_length) < 0.5:
+        return BlockDetectionResult(is_blocked=False)
+
+    # A 200 of about the same size as the (unblocked) direct response is the
+    # real page; the tolerance absorbs per-request tokens and timestamps
+    if (reference_length and reference_length >= MIN_REFERENCE_LENGTH and status_code == 200
+            and abs(content_length - reference_length) <= reference_length // 50):
+        return BlockDetectionResult(is_blocked=False)
+
+    reasons = []
+    confidence = 0.0
+
+    if status_code in [403, 429]:
+        reasons.append(f"HTTP {status_code}: {BLOCKED_STATUS_CODES.get(status_code, 'Error')}")
+        confidence += 0.3
+
+    # Empty and near-empty bodies can't contain any keyword, so they are
+    # judged on status and length alone
+    if len(content) >= _MIN_KEYWORD_LENGTH:
+        confidence = _score_keywords(content, content_length, confidence, reasons)
+
     if content_length < 500 and status_code >= 400:
         confidence += 0.2
         reasons.append("Short error response")
@@ -113,8 +198,14 @@ def detect_block(response_text: str, status_code: int, content_length: int,
     )
 
 
-def get_content_hash(content: str) -> str:
-    return hashlib.md5(content.encode()).hexdigest()
+def get_content_hash(content: Union[str, bytes]) -> str:
+    # Only used to compare responses, so a fast non-cryptographic hash is
+    # enough; md5 is kept as the fallback when xxhash isn't installed.
+    if isinstance(content, str):
+        content = content.encode()
+    if xxhash is not None:
+        return xxhash.xxh3_64_hexdigest(content)
+    return hashlib.md5(content).hexdigest()
 
 
 def check_ip_match(response_text: str, expected_ip: str) -> bool:
@@ -131,7 +222,9 @@ def looks_legitimate(response_text: str, min_length: int = 1000) -> bool:
     if len(response_text) < min_length:
         return False
 
-    has_html = bool(re.search(r'<html', response_text, re.IGNORECASE))
-    has_body = bool(re.search(r'<body', response_text, re.IGNORECASE))
-
-    return has_html and has_body
+    # <html> opens the document, but inline styles and scripts in <head>
+    # can push <body> well past the first few KB, so only the first check
+    # is bounded. Both searches run on the original text, so the body is
+    # never copied or lowercased.
+    html_match = _HTML_RE.search(response_text, 0, 4096)
+    return html_match is not None and _BODY_RE.search(response_text, html_match.start()) is not None
@@ -1,17 +1,18 @@
-from typing import Optional, List
+from typing import Optional, List, Tuple, TYPE_CHECKING
 
-from urllib.parse import urlparse
-
-from rich.console import Console
+from rich.console import Console, Group
 from rich.table import Table
 from rich.panel import Panel
-from rich.progress import Progress, SpinnerColumn, TextColumn, BarColumn, TaskProgressColumn
 from rich.text import Text
 from rich import box
 
 from proxy_parser import Proxy
 from tester import TestResult, MultiURLTestResult, URLTestResult
 
+if TYPE_CHECKING:
+    from rich.live import Live
+    from rich.progress import Progress
+
 
 console = Console()
 
@@ -53,7 +54,10 @@ def print_proxy_list(proxies: List[Proxy]):
     console.print()
 
 
-def create_progress() -> Progress:
+def create_progress() -> "Progress":
+    # Imported here: only needed once testing starts, not for the prompts
+    from rich.progress import Progress, SpinnerColumn, TextColumn, BarColumn, TaskProgressColumn
+
     return Progress(
         SpinnerColumn(),
         TextColumn("[progress.description]{task.description}"),
@@ -64,9 +68,9 @@ def create_progress() -> Progress:
     )
 
 
-def format_latency(ms: Optional[float]) -> str:
+def format_latency(ms: Optional[float]) -> Text:
     if ms is None:
-        return "[dim]-[/dim]"
+        return Text("-", style="dim")
 
     if ms < 500:
         color = "green"
@@ -75,12 +79,12 @@ def format_latency(ms: Optional[float]) -> str:
     else:
         color = "red"
 
-    return f"[{color}]{ms:.0f}ms[/{color}]"
+    return Text(f"{ms:.0f}ms", style=color)
 
 
-def format_speed(kbps: Optional[float]) -> str:
+def format_speed(kbps: Optional[float]) -> Text:
     if kbps is None or kbps < 1:
-        return "[dim]-[/dim]"
+        return Text("-", style="dim")
 
     if kbps >= 1024:
         mbps = kbps / 1024
@@ -90,7 +94,7 @@ def format_speed(kbps: Optional[float]) -> str:
             color = "yellow"
         else:
             color = "red"
-        return f"[{color}]{mbps:.1f}MB/s[/{color}]"
+        return Text(f"{mbps:.1f}MB/s", style=color)
     else:
         if kbps >= 500:
             color = "green"
@@ -98,31 +102,30 @@ def format_speed(kbps: Optional[float]) -> str:
             color = "yellow"
         else:
             color = "red"
-        return f"[{color}]{kbps:.0f}KB/s[/{color}]"
+        return Text(f"{kbps:.0f}KB/s", style=color)
 
 
-def format_status(result: TestResult) -> str:
+def format_status(result: TestResult) -> Text:
     if not result.success:
-        error = result.http_error or "Error"
-        return f"[red]ERR[/red]"
+        return Text("ERR", style="red")
 
     status = result.http_status
     if status is None:
-        return "[dim]-[/dim]"
+        return Text("-", style="dim")
 
     if 200 <= status < 300:
-        return f"[green]{status}[/green]"
+        return Text(str(status), style="green")
     elif 300 <= status < 400:
-        return f"[yellow]{status}[/yellow]"
+        return Text(str(status), style="yellow")
     else:
-        return f"[red]{status}[/red]"
+        return Text(str(status), style="red")
 
 
-def format_ping(ms: Optional[float], error: Optional[str] = None) -> str:
+def format_ping(ms: Optional[float], error: Optional[str] = None) -> Text:
     if ms is None:
         if error:
-            return "[red]FAIL[/red]"
-        return "[dim]-[/dim]"
+            return Text("FAIL", style="red")
+        return Text("-", style="dim")
 
     if ms < 50:
         color = "green"
@@ -131,33 +134,31 @@ def format_ping(ms: Optional[float], error: Optional[str] = None) -> str:
     else:
         color = "red"
 
-    return f"[{color}]{ms:.0f}ms[/{color}]"
+    return Text(f"{ms:.0f}ms", style=color)
 
 
-def format_blocked(result: TestResult) -> str:
+def format_blocked(result: TestResult) -> Text:
     if not result.success:
-        return "[dim]-[/dim]"
+        return Text("-", style="dim")
 
     if result.block_result is None:
-        return "[dim]?[/dim]"
+        return Text("?", style="dim")
 
     if result.block_result.is_blocked:
-        return f"[red]YES[/red]"
+        return Text("YES", style="red")
     else:
-        return f"[green]No[/green]"
+        return Text("No", style="green")
 
 
-def format_ip(ip: Optional[str]) -> str:
+def format_ip(ip: Optional[str]) -> Text:
     if ip is None:
-        return "[dim]-[/dim]"
+        return Text("-", style="dim")
     if len(ip) > 15:
-        return f"[cyan]{ip[:12]}...[/cyan]"
-    return f"[cyan]{ip}[/cyan]"
+        return Text(f"{ip[:12]}...", style="cyan")
+    return Text(ip, style="cyan")
 
 
-def print_results_table(results: List[TestResult]):
-    console.print()
-
+def create_results_table() -> Table:
     table = Table(
         show_header=True,
         header_style="bold white on blue",
@@ -175,50 +176,84 @@ def print_results_table(results: List[TestResult]):
     table.add_column("Blocked", justify="center", width=8)
     table.add_column("IP", justify="left", width=16)
 
+    return table
+
+
+def add_result_row(table: Table, index: int, result: TestResult):
+    proxy_str = f"{result.proxy.host}:{result.proxy.port}"
+
+    error_note = ""
+    if not result.success and result.http_error:
+        error_note = f"\n[dim red]{result.http_error}[/dim red]"
+
+    table.add_row(
+        str(index),
+        proxy_str + error_note,
+        format_status(result),
+        format_latency(result.latency_ms),
+        format_speed(result.download_speed_kbps),
+        format_ping(result.ping_ms, result.ping_error),
+        format_blocked(result),
+        format_ip(result.detected_ip)
+    )
+
+
+def print_results_table(results: List[TestResult]):
+    table = create_results_table()
     for i, result in enumerate(results, 1):
-        proxy_str = f"{result.proxy.host}:{result.proxy.port}"
+        add_result_row(table, i, result)
 
-        error_note = ""
-        if not result.success and result.http_error:
-            error_note = f"\n[dim red]{result.http_error}[/dim red]"
+    # Buffer the console so the whole table goes out in one write
+    with console:
+        console.print()
+        console.print(table)
+        console.print()
 
-        table.add_row(
-            str(i),
-            proxy_str + error_note,
-            format_status(result),
-            format_latency(result.latency_ms),
-            format_speed(result.download_speed_kbps),
-            format_ping(result.ping_ms, result.ping_error),
-            format_blocked(result),
-            format_ip(result.detected_ip)
-        )
 
-    console.print(table)
-    console.print()
+def create_live_display(*renderables) -> "Live":
+    # Renders everything passed in (e.g. a progress bar and a results table
+    # that is still being filled) as one live region. Refreshing is left to
+    # the caller so rows are never added while a frame is being drawn. The
+    # region is cleared on exit so the caller can print the final output.
+    from rich.live import Live
+
+    return Live(Group(*renderables), console=console, auto_refresh=False, transient=True)
+
+
+def refresh_live_results(live: "Live", progress: "Progress", rows: List[Tuple[int, TestResult]]):
+    # Live crops anything taller than the terminal, and redrawing the whole
+    # table on every refresh gets slower with each row, so only the latest
+    # rows that fit on screen are shown (two lines each, allowing for errors)
+    max_rows = max(1, (console.size.height - 12) // 2)
+    table = create_results_table()
+    for index, result in rows[-max_rows:]:
+        add_result_row(table, index, result)
+    live.update(Group(progress, table), refresh=True)
 
 
 def print_summary(results: List[TestResult]):
     total = len(results)
-    working = sum(1 for r in results if r.is_working())
-    failed = total - working
-
     working_results = [r for r in results if r.is_working()]
+    working = len(working_results)
+    failed = total - working
 
-    avg_latency = None
-    avg_speed = None
-    avg_ping = None
+    latency_sum = speed_sum = ping_sum = 0.0
+    latency_count = speed_count = ping_count = 0
 
-    if working_results:
-        latencies = [r.latency_ms for r in working_results if r.latency_ms]
-        speeds = [r.download_speed_kbps for r in working_results if r.download_speed_kbps]
-        pings = [r.ping_ms for r in working_results if r.ping_ms]
+    for r in working_results:
+        if r.latency_ms:
+            latency_sum += r.latency_ms
+            latency_count += 1
+        if r.download_speed_kbps:
+            speed_sum += r.download_speed_kbps
+            speed_count += 1
+        if r.ping_ms:
+            ping_sum += r.ping_ms
+            ping_count += 1
 
-        if latencies:
-            avg_latency = sum(latencies) / len(latencies)
-        if speeds:
-            avg_speed = sum(speeds) / len(speeds)
-        if pings:
-            avg_ping = sum(pings) / len(pings)
+    avg_latency = latency_sum / latency_count if latency_count else None
+    avg_speed = speed_sum / speed_count if speed_count else None
+    avg_ping = ping_sum / ping_count if ping_count else None
 
     if working == total:
         status_color = "green"
@@ -235,25 +270,26 @@ def print_summary(results: List[TestResult]):
     summary.append(" proxies working ", style="white")
     summary.append(f"({percentage:.0f}%)", style=f"{status_color}")
 
-    console.print(Panel(summary, box=box.ROUNDED))
+    with console:
+        console.print(Panel(summary, box=box.ROUNDED))
 
-    if working_results:
-        avg_text = Text()
-        avg_text.append("Averages: ", style="bold dim")
+        if working_results:
+            avg_text = Text()
+            avg_text.append("Averages: ", style="bold dim")
 
-        if avg_latency:
-            avg_text.append(f"Latency: {avg_latency:.0f}ms  ", style="cyan")
-        if avg_speed:
-            if avg_speed >= 1024:
-                avg_text.append(f"Speed: {avg_speed/1024:.1f}MB/s  ", style="cyan")
-            else:
-                avg_text.append(f"Speed: {avg_speed:.0f}KB/s  ", style="cyan")
-        if avg_ping:
-            avg_text.append(f"Ping: {avg_ping:.0f}ms", style="cyan")
+            if avg_latency:
+                avg_text.append(f"Latency: {avg_latency:.0f}ms  ", style="cyan")
+            if avg_speed:
+                if avg_speed >= 1024:
+                    avg_text.append(f"Speed: {avg_speed/1024:.1f}MB/s  ", style="cyan")
+                else:
+                    avg_text.append(f"Speed: {avg_speed:.0f}KB/s  ", style="cyan")
+            if avg_ping:
+                avg_text.append(f"Ping: {avg_ping:.0f}ms", style="cyan")
 
-        console.print(avg_text)
+            console.print(avg_text)
 
-    console.print()
+        console.print()
 
 
 def print_error(message: str):
@@ -275,6 +311,8 @@ def prompt(message: str, default: str = "") -> str:
 
 
 def get_domain(url: str) -> str:
+    from urllib.parse import urlparse
+
     parsed = urlparse(url)
     return parsed.netloc or url
 
@@ -295,21 +333,19 @@ def print_url_list(urls: List[str]):
     console.print()
 
 
-def format_url_status(result: URLTestResult) -> str:
+def format_url_status(result: URLTestResult) -> Text:
     if not result.success:
-        return "[red]ERR[/red]"
+        return Text("ERR", style="red")
     if result.http_status is None:
-        return "[dim]-[/dim]"
+        return Text("-", style="dim")
     if 200 <= result.http_status < 300:
-        return f"[green]{result.http_status}[/green]"
+        return Text(str(result.http_status), style="green")
     elif 300 <= result.http_status < 400:
-        return f"[yellow]{result.http_status}[/yellow]"
-    return f"[red]{result.http_status}[/red]"
+        return Text(str(result.http_status), style="yellow")
+    return Text(str(result.http_status), style="red")
 
 
 def print_multi_url_results(results: List[MultiURLTestResult], urls: List[str]):
-    console.print()
-
     table = Table(
         show_header=True,
         header_style="bold white on blue",
@@ -362,8 +398,10 @@ def print_multi_url_results(results: List[MultiURLTestResult], urls: List[str]):
 
         table.add_row(*row)
 
-    console.print(table)
-    console.print()
+    with console:
+        console.print()
+        console.print(table)
+        console.print()
 
 
 def print_multi_url_summary(results: List[MultiURLTestResult], urls: List[str]):
@@ -381,22 +419,23 @@ def print_multi_url_summary(results: List[MultiURLTestResult], urls: List[str]):
     summary.append(f"\n  All failed:        ", style="white")
     summary.append(f"{failed}/{total_proxies}", style="bold red")
 
-    console.print(Panel(summary, box=box.ROUNDED))
+    with console:
+        console.print(Panel(summary, box=box.ROUNDED))
 
-    console.print("\n[bold]Per-URL Success Rates:[/bold]")
+        console.print("\n[bold]Per-URL Success Rates:[/bold]")
 
-    for url in urls:
-        working = sum(1 for r in results if r.url_results.get(url) and r.url_results[url].is_working())
-        rate = (working / total_proxies * 100) if total_proxies > 0 else 0
+        for url in urls:
+            working = sum(1 for r in results if r.url_results.get(url) and r.url_results[url].is_working())
+            rate = (working / total_proxies * 100) if total_proxies > 0 else 0
 
-        if rate >= 80:
-            color = "green"
-        elif rate >= 50:
-            color = "yellow"
-        else:
-            color = "red"
+            if rate >= 80:
+                color = "green"
+            elif rate >= 50:
+                color = "yellow"
+            else:
+                color = "red"
 
-        short_url = truncate_url(url, 45)
-        console.print(f"  [{color}]{working}/{total_proxies}[/{color}] ({rate:.0f}%) {short_url}")
+            short_url = truncate_url(url, 45)
+            console.print(f"  [{color}]{working}/{total_proxies}[/{color}] ({rate:.0f}%) {short_url}")
 
-    console.print()
+        console.print()
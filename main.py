@@ -1,9 +1,11 @@
 #!/usr/bin/env python3
 import sys
 import os
+import time
 from typing import List
 
-sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, SCRIPT_DIR)
 
 from proxy_parser import parse_proxy_file, parse_selection, Proxy
 from tester import test_proxies_parallel, test_proxies_multi_url_parallel, TestResult, MultiURLTestResult
@@ -18,6 +20,8 @@ from display import (
     print_warning,
     prompt,
     create_progress,
+    create_live_display,
+    refresh_live_results,
     print_url_list,
     print_multi_url_results,
     print_multi_url_summary
@@ -27,10 +31,13 @@ from display import (
 DEFAULT_PROXY_FILE = "proxies.txt"
 DEFAULT_URL = "https://httpbin.org/ip"
 MAX_WORKERS = 10
+MAX_WORKERS_LIMIT = 500
+STREAM_RESULTS = True  # Show single-URL results as each proxy finishes
+LIVE_REFRESH_INTERVAL = 0.25  # Seconds between redraws of the live results
 
 
 def get_proxy_file_path() -> str:
-    default_path = os.path.join(os.path.dirname(__file__), DEFAULT_PROXY_FILE)
+    default_path = os.path.join(SCRIPT_DIR, DEFAULT_PROXY_FILE)
 
     if os.path.exists(default_path):
         filepath = prompt("Proxy file", DEFAULT_PROXY_FILE)
@@ -38,7 +45,7 @@ def get_proxy_file_path() -> str:
         filepath = prompt("Proxy file (path to .txt)")
 
     if not os.path.isabs(filepath):
-        filepath = os.path.join(os.path.dirname(__file__), filepath)
+        filepath = os.path.join(SCRIPT_DIR, filepath)
 
     return filepath
 
@@ -74,6 +81,24 @@ def get_proxy_selection(total: int) -> List[int]:
             print_warning("Invalid selection. Please try again.")
 
 
+def get_worker_count() -> int:
+    # The tests only wait on the network, so large lists can go well past the
+    # default without loading the machine
+    while True:
+        value = prompt("Concurrent tests", str(MAX_WORKERS))
+        try:
+            workers = int(value)
+        except ValueError:
+            workers = 0
+        if workers > MAX_WORKERS_LIMIT:
+            # Past this the run is limited by sockets and threads, not the network
+            print_warning(f"Using {MAX_WORKERS_LIMIT} concurrent tests (the maximum).")
+            return MAX_WORKERS_LIMIT
+        if workers > 0:
+            return workers
+        print_warning("Enter a number greater than 0.")
+
+
 def main():
     try:
         print_header()
@@ -104,6 +129,7 @@ def main():
         print_info(f"\nSelected {len(selected_proxies)} proxies for testing.\n")
 
         urls = get_target_urls()
+        max_workers = get_worker_count()
         console.print()
 
         if len(urls) > 1:
@@ -115,25 +141,75 @@ def main():
 
             results: List[TestResult] = []
 
-            with create_progress() as progress:
+            if STREAM_RESULTS:
+                progress = create_progress()
+                ping_task = progress.add_task("[cyan]Pinging proxies...", total=None)
                 task = progress.add_task(
                     "[cyan]Testing proxies...",
                     total=len(selected_proxies)
                 )
+                # Rows arrive in completion order; keep the list numbering
+                row_numbers = {id(proxy): i for i, proxy in enumerate(selected_proxies, 1)}
+                finished = []
+                last_refresh = 0.0
+
+                with create_live_display(progress) as live:
+                    # The live display only redraws when told to; results can
+                    # arrive far faster than a frame is drawn, so redraws are
+                    # capped at one per LIVE_REFRESH_INTERVAL
+                    def refresh_live(force: bool = False):
+                        nonlocal last_refresh
+                        now = time.perf_counter()
+                        if force or now - last_refresh >= LIVE_REFRESH_INTERVAL:
+                            last_refresh = now
+                            refresh_live_results(live, progress, finished)
+
+                    def on_ping(completed: int, total: int):
+                        progress.update(ping_task, completed=completed, total=total)
+                        refresh_live(force=completed == total)
+
+                    def on_progress(completed: int, total: int, result: TestResult):
+                        progress.update(task, completed=completed)
+                        finished.append((row_numbers[id(result.proxy)], result))
+                        refresh_live(force=completed == total)
+
+                    results = test_proxies_parallel(
+                        selected_proxies,
+                        urls[0],
+                        max_workers=max_workers,
+                        include_ping=True,
+                        include_ip_check=True,
+                        progress_callback=on_progress,
+                        ping_callback=on_ping
+                    )
+
+                print_results_table(results)
+            else:
+                with create_progress() as progress:
+                    ping_task = progress.add_task("[cyan]Pinging proxies...", total=None)
+                    task = progress.add_task(
+                        "[cyan]Testing proxies...",
+                        total=len(selected_proxies)
+                    )
+
+                    def on_ping(completed: int, total: int):
+                        progress.update(ping_task, completed=completed, total=total)
+
+                    def on_progress(completed: int, total: int, result: TestResult):
+                        progress.update(task, completed=completed)
+
+                    results = test_proxies_parallel(
+                        selected_proxies,
+                        urls[0],
+                        max_workers=max_workers,
+                        include_ping=True,
+                        include_ip_check=True,
+                        progress_callback=on_progress,
+                        ping_callback=on_ping
+                    )
+
+                print_results_table(results)
 
-                def on_progress(completed: int, total: int, result: TestResult):
-                    progress.update(task, completed=completed)
-
-                results = test_proxies_parallel(
-                    selected_proxies,
-                    urls[0],
-                    max_workers=MAX_WORKERS,
-                    include_ping=True,
-                    include_ip_check=True,
-                    progress_callback=on_progress
-                )
-
-            print_results_table(results)
             print_summary(results)
         else:
             print_info(f"Testing {len(selected_proxies)} proxies against {len(urls)} URLs...")
@@ -142,21 +218,26 @@ def main():
             multi_results: List[MultiURLTestResult] = []
 
             with create_progress() as progress:
+                ping_task = progress.add_task("[cyan]Pinging proxies...", total=None)
                 task = progress.add_task(
                     "[cyan]Testing proxies...",
                     total=len(selected_proxies)
                 )
 
+                def on_ping(completed: int, total: int):
+                    progress.update(ping_task, completed=completed, total=total)
+
                 def on_multi_progress(completed: int, total: int, result: MultiURLTestResult):
                     progress.update(task, completed=completed)
 
                 multi_results = test_proxies_multi_url_parallel(
                     selected_proxies,
                     urls,
-                    max_workers=MAX_WORKERS,
+                    max_workers=max_workers,
                     include_ping=True,
                     include_ip_check=True,
-                    progress_callback=on_multi_progress
+                    progress_callback=on_multi_progress,
+                    ping_callback=on_ping
                 )
 
             print_multi_url_results(multi_results, urls)
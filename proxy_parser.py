@@ -1,50 +1,67 @@
+import itertools
 import re
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from typing import Optional, List
 from enum import Enum
 
 
+# One pattern for every supported format:
+#   [scheme://][user:pass@]host:port[:user:pass]
+# The lookahead skips the user:pass@ attempt on lines without an '@'.
+_PROXY_RE = re.compile(
+    r'^(?:(?P<scheme>https?|socks5)://)?'
+    r'(?:(?=[^@]*@)(?P<at_user>[^:]+):(?P<at_pass>[^@]+)@)?'
+    r'(?P<host>[^:]+):(?P<port>\d+)'
+    r'(?::(?P<colon_user>[^:]+):(?P<colon_pass>.+))?$',
+    re.IGNORECASE
+)
+
+
 class ProxyType(Enum):
     HTTP = "http"
     HTTPS = "https"
     SOCKS5 = "socks5"
 
 
-@dataclass
+_SCHEME_PREFIX = {proxy_type: f"{proxy_type.value}://" for proxy_type in ProxyType}
+_SCHEME_TYPES = {proxy_type.value: proxy_type for proxy_type in ProxyType}
+
+
+@dataclass(frozen=True, slots=True)
 class Proxy:
     host: str
     port: int
     username: Optional[str] = None
     password: Optional[str] = None
     proxy_type: ProxyType = ProxyType.HTTP
-    raw: str = ""
+    raw: str = field(default="", compare=False)
+    # Formatted lazily and reused; a Proxy never changes once parsed
+    _display: Optional[str] = field(default=None, init=False, repr=False, compare=False)
+    _proxy_url: Optional[str] = field(default=None, init=False, repr=False, compare=False)
 
     def __str__(self) -> str:
-        auth = f"{self.username}:***@" if self.username else ""
-        return f"{self.proxy_type.value}://{auth}{self.host}:{self.port}"
+        if self._display is None:
+            auth = f"{self.username}:***@" if self.username else ""
+            object.__setattr__(self, "_display", f"{_SCHEME_PREFIX[self.proxy_type]}{auth}{self.host}:{self.port}")
+        return self._display
 
     def short_str(self) -> str:
         auth = " (auth)" if self.username else " (no auth)"
         return f"{self.host}:{self.port}{auth}"
 
     def get_request_proxies(self) -> dict:
-        if self.username and self.password:
-            auth = f"{self.username}:{self.password}@"
-        else:
-            auth = ""
+        if self._proxy_url is None:
+            if self.username and self.password:
+                auth = f"{self.username}:{self.password}@"
+            else:
+                auth = ""
+            object.__setattr__(self, "_proxy_url", f"{_SCHEME_PREFIX[self.proxy_type]}{auth}{self.host}:{self.port}")
 
-        proxy_url = f"{self.proxy_type.value}://{auth}{self.host}:{self.port}"
-
-        if self.proxy_type == ProxyType.SOCKS5:
-            return {
-                "http": proxy_url,
-                "https": proxy_url
-            }
-        else:
-            return {
-                "http": proxy_url,
-                "https": proxy_url
-            }
+        # A fresh dict each call: requests may add environment proxies to it
+        return {
+            "http": self._proxy_url,
+            "https": self._proxy_url
+        }
 
 
 def parse_proxy(line: str) -> Optional[Proxy]:
@@ -52,63 +69,24 @@ def parse_proxy(line: str) -> Optional[Proxy]:
     if not line or line.startswith('#'):
         return None
 
-    proxy_type = ProxyType.HTTP
+    match = _PROXY_RE.match(line)
+    if not match:
+        return None
+
+    scheme, at_user, at_pass, host, port, colon_user, colon_pass = match.groups()
+    if at_user and colon_user:
+        return None
+
+    proxy_type = _SCHEME_TYPES[scheme.lower()] if scheme else ProxyType.HTTP
 
-    url_match = re.match(
-        r'^(https?|socks5)://(?:([^:]+):([^@]+)@)?([^:]+):(\d+)$',
-        line,
-        re.IGNORECASE
+    return Proxy(
+        host=host,
+        port=int(port),
+        username=at_user or colon_user,
+        password=at_pass or colon_pass,
+        proxy_type=proxy_type,
+        raw=line
     )
-    if url_match:
-        scheme, username, password, host, port = url_match.groups()
-        if scheme.lower() == 'socks5':
-            proxy_type = ProxyType.SOCKS5
-        elif scheme.lower() == 'https':
-            proxy_type = ProxyType.HTTPS
-        return Proxy(
-            host=host,
-            port=int(port),
-            username=username,
-            password=password,
-            proxy_type=proxy_type,
-            raw=line
-        )
-
-    at_match = re.match(r'^([^:]+):([^@]+)@([^:]+):(\d+)$', line)
-    if at_match:
-        username, password, host, port = at_match.groups()
-        return Proxy(
-            host=host,
-            port=int(port),
-            username=username,
-            password=password,
-            proxy_type=proxy_type,
-            raw=line
-        )
-
-    colon_auth_match = re.match(r'^([^:]+):(\d+):([^:]+):(.+)$', line)
-    if colon_auth_match:
-        host, port, username, password = colon_auth_match.groups()
-        return Proxy(
-            host=host,
-            port=int(port),
-            username=username,
-            password=password,
-            proxy_type=proxy_type,
-            raw=line
-        )
-
-    simple_match = re.match(r'^([^:]+):(\d+)$', line)
-    if simple_match:
-        host, port = simple_match.groups()
-        return Proxy(
-            host=host,
-            port=int(port),
-            proxy_type=proxy_type,
-            raw=line
-        )
-
-    return None
 
 
 def parse_proxy_file(filepath: str) -> List[Proxy]:
@@ -125,7 +103,8 @@ def parse_proxy_file(filepath: str) -> List[Proxy]:
     except Exception as e:
         raise Exception(f"Error reading proxy file: {e}")
 
-    return proxies
+    # The same proxy listed twice, even in different formats, is tested once
+    return list(dict.fromkeys(proxies))
 
 
 def parse_selection(selection: str, total: int) -> List[int]:
@@ -135,7 +114,7 @@ def parse_selection(selection: str, total: int) -> List[int]:
     if selection == 'all':
         return list(range(total))
 
-    indices = set()
+    ranges = []
     parts = selection.replace(' ', '').split(',')
 
     for part in parts:
@@ -145,21 +124,19 @@ def parse_selection(selection: str, total: int) -> List[int]:
                 start, end = part.split('-')
                 start = int(start) - 1  # Convert to 0-based
                 end = int(end) - 1
-                for i in range(start, end + 1):
-                    if 0 <= i < total:
-                        indices.add(i)
             except ValueError:
                 continue
+            ranges.append(range(max(start, 0), min(end + 1, total)))
         else:
             # Single number
             try:
                 idx = int(part) - 1  # Convert to 0-based
-                if 0 <= idx < total:
-                    indices.add(idx)
             except ValueError:
                 continue
+            if 0 <= idx < total:
+                ranges.append((idx,))
 
-    return sorted(list(indices))
+    return sorted(set(itertools.chain.from_iterable(ranges)))
 
 
 if __name__ == "__main__":
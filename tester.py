@@ -1,16 +1,34 @@
+import os
+import json
 import time
-import subprocess
-import platform
+import asyncio
+import socket
+import ssl
+import threading
+from functools import partial
 from dataclasses import dataclass, field
 from typing import Optional, Callable, List, Dict, Tuple
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait
+from http.cookiejar import DefaultCookiePolicy
 import requests
+import urllib3
+from requests.adapters import HTTPAdapter
+from urllib3.util.request import ACCEPT_ENCODING
+from urllib3.util.ssl_ import create_urllib3_context
 
 from proxy_parser import Proxy
 from detector import detect_block, get_content_hash, BlockDetectionResult
 
+try:
+    import ping3
+except ImportError:
+    ping3 = None
+
+# Suppress SSL warnings
+urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
 
-@dataclass
+@dataclass(slots=True)
 class URLTestResult:
     url: str
     success: bool = False
@@ -31,7 +49,7 @@ class URLTestResult:
         return True
 
 
-@dataclass
+@dataclass(slots=True)
 class MultiURLTestResult:
     proxy: Proxy
     url_results: Dict[str, URLTestResult] = field(default_factory=dict)
@@ -54,7 +72,7 @@ class MultiURLTestResult:
         return sum(latencies) / len(latencies) if latencies else None
 
 
-@dataclass
+@dataclass(slots=True)
 class TestResult:
     proxy: Proxy
     success: bool = False
@@ -80,49 +98,157 @@ class TestResult:
 
 USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
 DEFAULT_TIMEOUT = 15
+POOL_MAXSIZE = 64
+PING_TIMEOUT = 2.0
+PING_CONCURRENCY = 256
+PING_PROGRESS_INTERVAL = 0.5
+USE_ICMP_PING = False  # ICMP needs ping3 and, on most systems, raw socket privileges
+MAX_BODY_BYTES = 256 * 1024  # Responses are only measured and scanned, never stored
+READ_CHUNK_SIZE = 16384
+REFERENCE_WORKERS = 8
+REFERENCE_CACHE_TTL = 3600
+REFERENCE_CACHE_PATH = os.path.join(
+    os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"),
+    "proxy-tester",
+    "refs.json",
+)
+IP_CACHE_TTL = 300
+IP_LOOKUP_WORKERS = 64
+IP_CHECK_TIMEOUT = 5
+
+IP_CHECK_URLS = (
+    "https://api.ipify.org",
+    "https://icanhazip.com",
+    "https://ipinfo.io/ip",
+)
+
+BROWSER_HEADERS = {
+    "User-Agent": USER_AGENT,
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
+    "Accept-Language": "en-US,en;q=0.9",
+    # Only offer encodings urllib3 can decode here (br/zstd need optional
+    # packages); an undecoded body would be scanned as noise
+    "Accept-Encoding": ACCEPT_ENCODING,
+    "Connection": "keep-alive",
+    "Upgrade-Insecure-Requests": "1",
+    "Sec-Fetch-Dest": "document",
+    "Sec-Fetch-Mode": "navigate",
+    "Sec-Fetch-Site": "none",
+    "Sec-Fetch-User": "?1",
+    "Cache-Control": "max-age=0",
+}
+
+SIMPLE_HEADERS = {"User-Agent": USER_AGENT}
+
+
+# Without an explicit context urllib3 builds a new SSLContext and reloads the
+# system CA store for every connection, even when nothing is verified
+_UNVERIFIED_SSL_CONTEXT = create_urllib3_context(cert_reqs=ssl.CERT_NONE)
+
+
+class _TLSContextAdapter(HTTPAdapter):
+    # build_connection_pool_key_attributes is the pool-key hook requests added
+    # in 2.32.2, which is why requirements.txt pins that as the minimum
+    def build_connection_pool_key_attributes(self, request, verify, cert=None):
+        host_params, pool_kwargs = super().build_connection_pool_key_attributes(request, verify, cert)
+        # urllib3 sets verify_mode on the context it is given, so only share
+        # it between requests that all skip verification
+        if verify is False and host_params["scheme"] == "https":
+            pool_kwargs["ssl_context"] = _UNVERIFIED_SSL_CONTEXT
+        return host_params, pool_kwargs
+
+
+def _make_session(pool_maxsize: int = POOL_MAXSIZE) -> requests.Session:
+    session = requests.Session()
+    # A shared session must not carry cookies from one proxy's test into the next
+    session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+    adapter = _TLSContextAdapter(pool_connections=pool_maxsize, pool_maxsize=pool_maxsize, max_retries=0)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+# Direct (unproxied) requests share one session
+_SESSION = _make_session()
+
+_thread_state = threading.local()
+
+# Proxy -> (monotonic time of the lookup, detected IP or None)
+_IP_CACHE: Dict[Proxy, Tuple[float, Optional[str]]] = {}
+_IP_LOCK = threading.Lock()
+
+# Shared by every lookup so the echo requests can't add threads per worker;
+# it also bounds how many may still be in flight when the run ends
+_IP_LOOKUP_EXECUTOR = ThreadPoolExecutor(max_workers=IP_LOOKUP_WORKERS, thread_name_prefix="ip-lookup")
+
+
+def _session() -> requests.Session:
+    # Each worker thread keeps its own session, so all requests made for one
+    # proxy reuse the same tunnel; callers release the proxy's pools when done
+    session = getattr(_thread_state, "session", None)
+    if session is None:
+        session = _thread_state.session = _make_session(pool_maxsize=16)
+    return session
+
+
+def _release_proxy_pools(session: requests.Session) -> None:
+    # close() would only empty each pool manager and leave it in the adapter,
+    # so a long-lived worker session would keep one per proxy tested. A worker
+    # session only ever serves one proxy at a time, so every manager can go
+    # (this also sidesteps matching requests' normalised proxy-URL keys).
+    for adapter in set(session.adapters.values()):
+        for manager in adapter.proxy_manager.values():
+            manager.clear()
+        adapter.proxy_manager.clear()
+
+
+def _read_capped(response: requests.Response) -> bytes:
+    # Stop downloading once MAX_BODY_BYTES have arrived; huge error pages and
+    # captive portals would otherwise be pulled in full through slow proxies
+    body = bytearray()
+    try:
+        for chunk in response.iter_content(READ_CHUNK_SIZE):
+            body += chunk
+            if len(body) >= MAX_BODY_BYTES:
+                del body[MAX_BODY_BYTES:]
+                break
+    finally:
+        response.close()
+    return bytes(body)
 
 
 def test_http(proxy: Proxy, url: str, timeout: int = DEFAULT_TIMEOUT,
-               reference_hash: Optional[str] = None, reference_length: Optional[int] = None) -> TestResult:
+               reference_hash: Optional[str] = None, reference_length: Optional[int] = None,
+               session: Optional[requests.Session] = None) -> TestResult:
     result = TestResult(proxy=proxy)
-
-    headers = {
-        "User-Agent": USER_AGENT,
-        "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
-        "Accept-Language": "en-US,en;q=0.9",
-        "Accept-Encoding": "gzip, deflate, br",
-        "Connection": "keep-alive",
-        "Upgrade-Insecure-Requests": "1",
-        "Sec-Fetch-Dest": "document",
-        "Sec-Fetch-Mode": "navigate",
-        "Sec-Fetch-Site": "none",
-        "Sec-Fetch-User": "?1",
-        "Cache-Control": "max-age=0",
-    }
+    session = session or _session()
 
     try:
         proxies = proxy.get_request_proxies()
 
-        start_time = time.time()
-        response = requests.get(
+        start_time = time.perf_counter()
+        response = session.get(
             url,
             proxies=proxies,
-            headers=headers,
+            headers=BROWSER_HEADERS,
             timeout=timeout,
             verify=False,  # Ignore SSL errors for testing
-            allow_redirects=True
+            allow_redirects=True,
+            stream=True
         )
-        end_time = time.time()
+        content = _read_capped(response)
+        end_time = time.perf_counter()
 
         result.latency_ms = (end_time - start_time) * 1000
         result.http_status = response.status_code
-        result.content_length = len(response.content)
+        # Capped at MAX_BODY_BYTES
+        result.content_length = len(content)
 
-        if result.latency_ms > 0:
-            result.download_speed_kbps = (result.content_length / 1024) / (result.latency_ms / 1000)
+        if result.latency_ms:
+            result.download_speed_kbps = result.content_length * 1000.0 / (1024.0 * result.latency_ms)
 
         result.block_result = detect_block(
-            response_text=response.text,
+            content=content,
             status_code=response.status_code,
             content_length=result.content_length,
             reference_hash=reference_hash,
@@ -153,187 +279,407 @@ def test_http(proxy: Proxy, url: str, timeout: int = DEFAULT_TIMEOUT,
     return result
 
 
-def test_ping(proxy: Proxy, count: int = 3) -> tuple[Optional[float], Optional[str]]:
-    host = proxy.host
-    system = platform.system().lower()
-
+def _tcp_ping(host: str, port: int, count: int = 3,
+              timeout: float = PING_TIMEOUT) -> tuple[Optional[float], Optional[str]]:
+    # Time the TCP handshake with the proxy itself, which is also what every
+    # request through it has to pay
     try:
-        if system == "windows":
-            cmd = ["ping", "-n", str(count), "-w", "2000", host]
-        else:
-            cmd = ["ping", "-c", str(count), "-W", "2", host]
-
-        result = subprocess.run(
-            cmd,
-            capture_output=True,
-            text=True,
-            timeout=10
-        )
+        family, type_, proto, _, address = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)[0]
+    except socket.gaierror:
+        return None, "Could not resolve host"
+
+    samples = []
+    error = None
+    for _ in range(count):
+        sock = socket.socket(family, type_, proto)
+        sock.settimeout(timeout)
+        try:
+            start = time.perf_counter()
+            sock.connect(address)
+            samples.append((time.perf_counter() - start) * 1000)
+        except socket.timeout:
+            error = "Ping timeout"
+        except OSError:
+            error = "Host unreachable"
+        finally:
+            sock.close()
+
+    if samples:
+        return round(sum(samples) / len(samples), 2), None
+    return None, error
+
+
+def _icmp_ping(host: str, count: int = 3,
+               timeout: float = PING_TIMEOUT) -> tuple[Optional[float], Optional[str]]:
+    samples = []
+    for _ in range(count):
+        delay = ping3.ping(host, timeout=timeout, unit="ms")
+        if delay:
+            samples.append(delay)
+
+    if samples:
+        return round(sum(samples) / len(samples), 2), None
+    return None, "Host unreachable"
+
+
+def test_ping(proxy: Proxy, count: int = 3, icmp: bool = USE_ICMP_PING) -> tuple[Optional[float], Optional[str]]:
+    try:
+        if icmp and ping3 is not None:
+            return _icmp_ping(proxy.host, count)
+        return _tcp_ping(proxy.host, proxy.port, count)
+    except Exception as e:
+        return None, f"Ping error: {str(e)[:30]}"
 
-        if result.returncode == 0:
-            output = result.stdout
-            if system == "windows":
-                import re
-                match = re.search(r'Average\s*=\s*(\d+)ms', output)
-                if match:
-                    return float(match.group(1)), None
-            else:
-                import re
-                match = re.search(r'avg[^=]*=\s*[\d.]+/([\d.]+)/', output)
-                if match:
-                    return float(match.group(1)), None
-                times = re.findall(r'time[=<]([\d.]+)\s*ms', output)
-                if times:
-                    avg = sum(float(t) for t in times) / len(times)
-                    return round(avg, 2), None
-
-            return None, "Could not parse ping output"
-        else:
-            return None, "Host unreachable"
 
-    except subprocess.TimeoutExpired:
-        return None, "Ping timeout"
+def _icmp_ping_guarded(host: str, count: int = 3) -> tuple[Optional[float], Optional[str]]:
+    try:
+        return _icmp_ping(host, count)
     except Exception as e:
         return None, f"Ping error: {str(e)[:30]}"
 
 
-def check_proxy_ip(proxy: Proxy, timeout: int = 10) -> Optional[str]:
-    ip_check_urls = [
-        "https://api.ipify.org",
-        "https://icanhazip.com",
-        "https://ipinfo.io/ip",
+async def _tcp_ping_async(host: str, port: int, count: int, timeout: float,
+                          semaphore: asyncio.Semaphore) -> tuple[Optional[float], Optional[str]]:
+    # Same probe as _tcp_ping, but many endpoints can share one event loop
+    async with semaphore:
+        loop = asyncio.get_running_loop()
+        try:
+            family, type_, proto, _, address = (
+                await loop.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+            )[0]
+        except socket.gaierror:
+            return None, "Could not resolve host"
+
+        samples = []
+        error = None
+        for _ in range(count):
+            sock = socket.socket(family, type_, proto)
+            sock.setblocking(False)
+            try:
+                start = time.perf_counter()
+                await asyncio.wait_for(loop.sock_connect(sock, address), timeout)
+                samples.append((time.perf_counter() - start) * 1000)
+            except asyncio.TimeoutError:
+                error = "Ping timeout"
+            except OSError:
+                error = "Host unreachable"
+            finally:
+                sock.close()
+
+    if samples:
+        return round(sum(samples) / len(samples), 2), None
+    return None, error
+
+
+async def _tcp_ping_all(endpoints: List[Tuple[str, int]], count: int, timeout: float,
+                        progress_callback: Optional[Callable[[int, int], None]] = None
+                        ) -> List[tuple[Optional[float], Optional[str]]]:
+    semaphore = asyncio.Semaphore(PING_CONCURRENCY)
+    tasks = [
+        asyncio.ensure_future(_tcp_ping_async(host, port, count, timeout, semaphore))
+        for host, port in endpoints
+    ]
+
+    pending = set(tasks)
+    while pending:
+        # Report at least every PING_PROGRESS_INTERVAL so a live display keeps
+        # moving while dead endpoints time out
+        _, pending = await asyncio.wait(pending, timeout=PING_PROGRESS_INTERVAL)
+        if progress_callback:
+            progress_callback(len(tasks) - len(pending), len(tasks))
+
+    return [
+        (None, f"Ping error: {str(t.exception())[:30]}") if t.exception() else t.result()
+        for t in tasks
     ]
 
-    for url in ip_check_urls:
-        try:
-            response = requests.get(
-                url,
-                proxies=proxy.get_request_proxies(),
-                timeout=timeout,
-                headers={"User-Agent": USER_AGENT}
-            )
-            if response.status_code == 200:
-                ip = response.text.strip()
-                if ip and len(ip) < 50:
-                    return ip
-        except:
-            continue
 
+def _icmp_ping_all(hosts: List[str], count: int,
+                   progress_callback: Optional[Callable[[int, int], None]] = None
+                   ) -> Dict[str, tuple[Optional[float], Optional[str]]]:
+    with ThreadPoolExecutor(max_workers=min(len(hosts), PING_CONCURRENCY)) as executor:
+        future_to_host = {executor.submit(_icmp_ping_guarded, host, count): host for host in hosts}
+        pending = set(future_to_host)
+        while pending:
+            _, pending = wait(pending, timeout=PING_PROGRESS_INTERVAL)
+            if progress_callback:
+                progress_callback(len(future_to_host) - len(pending), len(future_to_host))
+
+    return {host: future.result() for future, host in future_to_host.items()}
+
+
+def ping_proxies(proxies: List[Proxy], count: int = 3, icmp: bool = USE_ICMP_PING,
+                 progress_callback: Optional[Callable[[int, int], None]] = None
+                 ) -> Dict[Tuple[str, int], tuple[Optional[float], Optional[str]]]:
+    # Ping every distinct endpoint once, all at the same time, instead of
+    # one proxy at a time inside the test workers. progress_callback gets
+    # (done, total) from the calling thread.
+    endpoints = list(dict.fromkeys((proxy.host, proxy.port) for proxy in proxies))
+    if not endpoints:
+        return {}
+
+    if icmp and ping3 is not None:
+        hosts = list(dict.fromkeys(host for host, _ in endpoints))
+        if progress_callback:
+            progress_callback(0, len(hosts))
+        host_pings = _icmp_ping_all(hosts, count, progress_callback)
+        return {(host, port): host_pings[host] for host, port in endpoints}
+
+    if progress_callback:
+        progress_callback(0, len(endpoints))
+    return dict(zip(endpoints, asyncio.run(_tcp_ping_all(endpoints, count, PING_TIMEOUT, progress_callback))))
+
+
+def _fetch_proxy_ip(url: str, proxy: Proxy, timeout: int) -> Optional[str]:
+    # Runs on its own helper thread and may outlive the lookup that started
+    # it, so it gets a private session instead of borrowing the worker's
+    with _make_session(pool_maxsize=1) as session:
+        response = session.get(
+            url,
+            proxies=proxy.get_request_proxies(),
+            timeout=timeout,
+            headers=SIMPLE_HEADERS
+        )
+    if response.status_code == 200:
+        # An IP is plain ASCII; decoding directly skips charset detection
+        ip = response.content.decode(response.encoding or "utf-8", errors="replace").strip()
+        if ip and len(ip) < 50:
+            return ip
     return None
 
 
+def _lookup_proxy_ip(proxy: Proxy, timeout: int) -> Optional[str]:
+    # Ask all echo services at once and take the first usable answer, so a
+    # service that times out doesn't hold up the others
+    futures = [_IP_LOOKUP_EXECUTOR.submit(_fetch_proxy_ip, url, proxy, timeout) for url in IP_CHECK_URLS]
+    try:
+        for future in as_completed(futures):
+            try:
+                ip = future.result()
+            except Exception:
+                continue
+            if ip:
+                return ip
+        return None
+    finally:
+        # Lookups that haven't started yet are dropped once there is an answer
+        for future in futures:
+            future.cancel()
+
+
+def check_proxy_ip(proxy: Proxy, timeout: int = IP_CHECK_TIMEOUT, ttl_seconds: float = IP_CACHE_TTL) -> Optional[str]:
+    # Failed lookups are cached too, so a dead proxy isn't asked three times again
+    now = time.monotonic()
+    with _IP_LOCK:
+        cached = _IP_CACHE.get(proxy)
+    if cached is not None and now - cached[0] < ttl_seconds:
+        return cached[1]
+
+    ip = _lookup_proxy_ip(proxy, timeout)
+
+    with _IP_LOCK:
+        _IP_CACHE[proxy] = (time.monotonic(), ip)
+    return ip
+
+
 def get_reference_response(url: str, timeout: int = DEFAULT_TIMEOUT) -> tuple[Optional[str], Optional[int]]:
     try:
-        response = requests.get(
+        response = _SESSION.get(
             url,
-            headers={"User-Agent": USER_AGENT},
+            headers=SIMPLE_HEADERS,
             timeout=timeout,
-            verify=False
+            verify=False,
+            stream=True
         )
-        content_hash = get_content_hash(response.text)
-        return content_hash, len(response.content)
+        # Capped the same way as the proxied responses it is compared against
+        content = _read_capped(response)
+        content_hash = get_content_hash(content)
+        # Only a clean 200 can vouch for proxied responses of the same size
+        if response.status_code != 200 or detect_block(content, 200, len(content)).is_blocked:
+            return content_hash, None
+        return content_hash, len(content)
     except:
         return None, None
 
 
+def _is_fresh_reference_entry(entry, now: float) -> bool:
+    # The file may have been edited by hand, so anything with the wrong
+    # shape counts as a miss rather than reaching detect_block
+    if not isinstance(entry, dict):
+        return False
+    fetched_at, ref_hash, ref_length = entry.get("t"), entry.get("h"), entry.get("l")
+    return (
+        isinstance(fetched_at, (int, float)) and not isinstance(fetched_at, bool)
+        and 0 <= now - fetched_at < REFERENCE_CACHE_TTL
+        and (ref_hash is None or isinstance(ref_hash, str))
+        and (ref_length is None or (isinstance(ref_length, int) and not isinstance(ref_length, bool)))
+    )
+
+
+def _load_reference_cache(now: float) -> Dict[str, dict]:
+    # Only fresh, well-formed entries are kept, so expired URLs drop out of
+    # the file the next time it is saved
+    try:
+        with open(REFERENCE_CACHE_PATH, encoding="utf-8") as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(cache, dict):
+        return {}
+    return {url: entry for url, entry in cache.items() if _is_fresh_reference_entry(entry, now)}
+
+
+def _save_reference_cache(cache: Dict[str, dict]) -> None:
+    # Write to a temp file and swap it in so an interrupted run can't leave
+    # half a file behind
+    try:
+        os.makedirs(os.path.dirname(REFERENCE_CACHE_PATH), exist_ok=True)
+        tmp_path = REFERENCE_CACHE_PATH + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(cache, f)
+        os.replace(tmp_path, REFERENCE_CACHE_PATH)
+    except OSError:
+        pass
+
+
+def get_reference_responses(urls: List[str]) -> Dict[str, Tuple[Optional[str], Optional[int]]]:
+    # References from recent runs are reused from disk; the rest are fetched
+    # concurrently and written back
+    now = time.time()
+    cache = _load_reference_cache(now)
+
+    reference_data: Dict[str, Tuple[Optional[str], Optional[int]]] = {}
+    missing = []
+    for url in urls:
+        entry = cache.get(url)
+        if entry is not None:
+            reference_data[url] = (entry["h"], entry["l"])
+        else:
+            missing.append(url)
+
+    if missing:
+        with ThreadPoolExecutor(max_workers=min(len(missing), REFERENCE_WORKERS)) as executor:
+            future_to_url = {executor.submit(get_reference_response, url): url for url in missing}
+            for future in as_completed(future_to_url):
+                url = future_to_url[future]
+                ref_hash, ref_length = reference_data[url] = future.result()
+                # Failed fetches are retried next run instead of being cached
+                if ref_hash is not None:
+                    cache[url] = {"h": ref_hash, "l": ref_length, "t": now}
+
+        _save_reference_cache(cache)
+
+    return reference_data
+
+
 def test_proxy_full(proxy: Proxy, url: str, reference_hash: Optional[str] = None,
                     reference_length: Optional[int] = None, include_ping: bool = True,
                     include_ip_check: bool = True) -> TestResult:
-    result = test_http(proxy, url, reference_hash=reference_hash, reference_length=reference_length)
+    session = _session()
+    try:
+        result = test_http(proxy, url, reference_hash=reference_hash, reference_length=reference_length,
+                           session=session)
 
-    if include_ping:
-        ping_ms, ping_error = test_ping(proxy)
-        result.ping_ms = ping_ms
-        result.ping_error = ping_error
+        if include_ping:
+            ping_ms, ping_error = test_ping(proxy)
+            result.ping_ms = ping_ms
+            result.ping_error = ping_error
 
-    if include_ip_check and result.success:
-        result.detected_ip = check_proxy_ip(proxy)
+        if include_ip_check and result.success:
+            result.detected_ip = check_proxy_ip(proxy)
+    finally:
+        # Free this proxy's sockets before the thread moves on to the next one
+        _release_proxy_pools(session)
 
     return result
 
 
+def _test_proxy_full_guarded(proxy: Proxy, url: str, reference_hash: Optional[str],
+                             reference_length: Optional[int], include_ip_check: bool,
+                             pings: Optional[Dict[Tuple[str, int], tuple[Optional[float], Optional[str]]]]) -> TestResult:
+    try:
+        result = test_proxy_full(proxy, url, reference_hash, reference_length, False, include_ip_check)
+    except Exception as e:
+        result = TestResult(
+            proxy=proxy,
+            success=False,
+            http_error=f"Test failed: {str(e)[:50]}"
+        )
+
+    if pings is not None:
+        result.ping_ms, result.ping_error = pings[proxy.host, proxy.port]
+    return result
+
+
 def test_proxies_parallel(proxies: List[Proxy], url: str, max_workers: int = 10,
                           include_ping: bool = True, include_ip_check: bool = True,
-                          progress_callback: Optional[Callable[[int, int, TestResult], None]] = None) -> List[TestResult]:
-    reference_hash, reference_length = get_reference_response(url)
+                          progress_callback: Optional[Callable[[int, int, TestResult], None]] = None,
+                          ping_callback: Optional[Callable[[int, int], None]] = None) -> List[TestResult]:
+    reference_hash, reference_length = get_reference_responses([url])[url]
+    pings = ping_proxies(proxies, progress_callback=ping_callback) if include_ping else None
+
+    run_test = partial(
+        _test_proxy_full_guarded,
+        url=url,
+        reference_hash=reference_hash,
+        reference_length=reference_length,
+        include_ip_check=include_ip_check,
+        pings=pings
+    )
 
     results = [None] * len(proxies)
     completed = 0
 
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        future_to_index = {
-            executor.submit(
-                test_proxy_full,
-                proxy,
-                url,
-                reference_hash,
-                reference_length,
-                include_ping,
-                include_ip_check
-            ): i
-            for i, proxy in enumerate(proxies)
-        }
+    # No point starting more threads than there are proxies
+    with ThreadPoolExecutor(max_workers=max(1, min(len(proxies), max_workers))) as executor:
+        if progress_callback is None:
+            # Nobody is watching completions, so let map keep the input order
+            return list(executor.map(run_test, proxies))
+
+        future_to_index = {executor.submit(run_test, proxy): i for i, proxy in enumerate(proxies)}
 
         for future in as_completed(future_to_index):
-            index = future_to_index[future]
-            try:
-                result = future.result()
-            except Exception as e:
-                result = TestResult(
-                    proxy=proxies[index],
-                    success=False,
-                    http_error=f"Test failed: {str(e)[:50]}"
-                )
-
-            results[index] = result
+            result = future.result()
+            results[future_to_index[future]] = result
             completed += 1
 
-            if progress_callback:
-                progress_callback(completed, len(proxies), result)
+            progress_callback(completed, len(proxies), result)
 
     return results
 
 
-# Suppress SSL warnings
-import urllib3
-urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
-
-
 def test_http_for_url(proxy: Proxy, url: str, reference_hash: Optional[str] = None,
-                      reference_length: Optional[int] = None, timeout: int = DEFAULT_TIMEOUT) -> URLTestResult:
+                      reference_length: Optional[int] = None, timeout: int = DEFAULT_TIMEOUT,
+                      session: Optional[requests.Session] = None) -> URLTestResult:
     result = URLTestResult(url=url)
-
-    headers = {
-        "User-Agent": USER_AGENT,
-        "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
-        "Accept-Language": "en-US,en;q=0.9",
-        "Accept-Encoding": "gzip, deflate, br",
-        "Connection": "keep-alive",
-    }
+    session = session or _session()
 
     try:
         proxies = proxy.get_request_proxies()
 
-        start_time = time.time()
-        response = requests.get(
+        start_time = time.perf_counter()
+        response = session.get(
             url,
             proxies=proxies,
-            headers=headers,
+            headers=BROWSER_HEADERS,
             timeout=timeout,
             verify=False,
-            allow_redirects=True
+            allow_redirects=True,
+            stream=True
         )
-        end_time = time.time()
+        content = _read_capped(response)
+        end_time = time.perf_counter()
 
         result.latency_ms = (end_time - start_time) * 1000
         result.http_status = response.status_code
-        result.content_length = len(response.content)
+        # Capped at MAX_BODY_BYTES
+        result.content_length = len(content)
 
-        if result.latency_ms > 0:
-            result.download_speed_kbps = (result.content_length / 1024) / (result.latency_ms / 1000)
+        if result.latency_ms:
+            result.download_speed_kbps = result.content_length * 1000.0 / (1024.0 * result.latency_ms)
 
         result.block_result = detect_block(
-            response_text=response.text,
+            content=content,
             status_code=response.status_code,
             content_length=result.content_length,
             reference_hash=reference_hash,
@@ -363,61 +709,76 @@ def test_proxy_multi_url(proxy: Proxy, urls: List[str],
                          include_ping: bool = True, include_ip_check: bool = True) -> MultiURLTestResult:
     result = MultiURLTestResult(proxy=proxy)
 
-    for url in urls:
-        ref_hash, ref_length = reference_data.get(url, (None, None))
-        url_result = test_http_for_url(proxy, url, ref_hash, ref_length)
-        result.url_results[url] = url_result
+    session = _session()
+    try:
+        for url in urls:
+            ref_hash, ref_length = reference_data.get(url, (None, None))
+            url_result = test_http_for_url(proxy, url, ref_hash, ref_length, session=session)
+            result.url_results[url] = url_result
+
+        if include_ping:
+            result.ping_ms, result.ping_error = test_ping(proxy)
+
+        if include_ip_check and any(r.success for r in result.url_results.values()):
+            result.detected_ip = check_proxy_ip(proxy)
+    finally:
+        # Free this proxy's sockets before the thread moves on to the next one
+        _release_proxy_pools(session)
+
+    return result
 
-    if include_ping:
-        result.ping_ms, result.ping_error = test_ping(proxy)
 
-    if include_ip_check and any(r.success for r in result.url_results.values()):
-        result.detected_ip = check_proxy_ip(proxy)
+def _test_proxy_multi_url_guarded(proxy: Proxy, urls: List[str],
+                                  reference_data: Dict[str, Tuple[Optional[str], Optional[int]]],
+                                  include_ip_check: bool,
+                                  pings: Optional[Dict[Tuple[str, int], tuple[Optional[float], Optional[str]]]]) -> MultiURLTestResult:
+    try:
+        result = test_proxy_multi_url(proxy, urls, reference_data, False, include_ip_check)
+    except Exception as e:
+        result = MultiURLTestResult(proxy=proxy)
+        for url in urls:
+            result.url_results[url] = URLTestResult(
+                url=url,
+                success=False,
+                http_error=f"Test failed: {str(e)[:50]}"
+            )
 
+    if pings is not None:
+        result.ping_ms, result.ping_error = pings[proxy.host, proxy.port]
     return result
 
 
 def test_proxies_multi_url_parallel(proxies: List[Proxy], urls: List[str], max_workers: int = 10,
                                      include_ping: bool = True, include_ip_check: bool = True,
-                                     progress_callback: Optional[Callable[[int, int, MultiURLTestResult], None]] = None) -> List[MultiURLTestResult]:
-    reference_data: Dict[str, Tuple[Optional[str], Optional[int]]] = {}
-    for url in urls:
-        ref_hash, ref_length = get_reference_response(url)
-        reference_data[url] = (ref_hash, ref_length)
+                                     progress_callback: Optional[Callable[[int, int, MultiURLTestResult], None]] = None,
+                                     ping_callback: Optional[Callable[[int, int], None]] = None) -> List[MultiURLTestResult]:
+    reference_data = get_reference_responses(urls)
+    pings = ping_proxies(proxies, progress_callback=ping_callback) if include_ping else None
+
+    run_test = partial(
+        _test_proxy_multi_url_guarded,
+        urls=urls,
+        reference_data=reference_data,
+        include_ip_check=include_ip_check,
+        pings=pings
+    )
 
     results: List[Optional[MultiURLTestResult]] = [None] * len(proxies)
     completed = 0
 
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        future_to_index = {
-            executor.submit(
-                test_proxy_multi_url,
-                proxy,
-                urls,
-                reference_data,
-                include_ping,
-                include_ip_check
-            ): i
-            for i, proxy in enumerate(proxies)
-        }
+    # No point starting more threads than there are proxies
+    with ThreadPoolExecutor(max_workers=max(1, min(len(proxies), max_workers))) as executor:
+        if progress_callback is None:
+            # Nobody is watching completions, so let map keep the input order
+            return list(executor.map(run_test, proxies))
+
+        future_to_index = {executor.submit(run_test, proxy): i for i, proxy in enumerate(proxies)}
 
         for future in as_completed(future_to_index):
-            index = future_to_index[future]
-            try:
-                result = future.result()
-            except Exception as e:
-                result = MultiURLTestResult(proxy=proxies[index])
-                for url in urls:
-                    result.url_results[url] = URLTestResult(
-                        url=url,
-                        success=False,
-                        http_error=f"Test failed: {str(e)[:50]}"
-                    )
-
-            results[index] = result
+            result = future.result()
+            results[future_to_index[future]] = result
             completed += 1
 
-            if progress_callback:
-                progress_callback(completed, len(proxies), result)
+            progress_callback(completed, len(proxies), result)
 
     return results  # type: ignore